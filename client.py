@@ -6,77 +6,108 @@ Skeleton for a networked ASCII "Battle Game" client in Python.
 1. Connect to the server via TCP.
 2. Continuously read user input (MOVE, ATTACK, QUIT).
 3. Send commands to the server.
-4. Spawn a thread to receive and display the updated game state from the server.
+4. Receive and display the updated game state from the server.
+
+Both the keyboard and the server socket are watched by one selector, so a
+single thread handles input and updates as soon as either is ready.
 
 Usage:
    python client.py <SERVER_IP> <PORT>
 """
 
+import os
 import sys
+import codecs
 import socket
-import threading
-import time
+import selectors
 
-BUFFER_SIZE = 1024
-g_serverSocket = None  # shared by main thread and receiver thread
+BUFFER_SIZE = 4096
+PROMPT = "Enter command (MOVE/ATTACK/QUIT): "
+g_serverSocket = None  # connection to the server
+g_recvBuffer = bytearray(BUFFER_SIZE)  # reused for every recv
+# a character can be split across two recvs, so decode incrementally
+g_decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+g_stdinPending = bytearray()  # typed bytes not yet ending in '\n'
 
 ###############################################################################
-# TODO: continuously receive updates (ASCII grid) from the server
+# Receive and display one update (ASCII grid, chat, ...) from the server
 ###############################################################################
-# def receiverThread():
-#     global g_serverSocket
-#     while True:
-#         try:
-#             received_data = g_serverSocket.recv(BUFFER_SIZE)
-
-#             if not received_data:
-#                 print("no data received")
-#                 break
-
-#             data_decoded = received_data.decode('utf-8')
-#             print(data_decoded)
-
-#         except (socket.error, ConnectionResetError):  # catch errors
-#             break 
-
-#     g_serverSocket.close()
-#     sys.exit(0)
-
-def receiverThread():
-    global g_serverSocket
-    global checkDisconnect
+def receiveUpdate():
+    """Print one message from the server. Returns False once it is gone."""
+    try:
+        n = g_serverSocket.recv_into(g_recvBuffer) #receive data from the server
+    except (socket.error, ConnectionResetError):
+        print("Connection lost.")
+        return False
+
+    # if data is none
+    if n == 0:
+        print("Server disconnected.")
+        return False
+
+    msg = g_decoder.decode(memoryview(g_recvBuffer)[:n]) #decode the data
+    if not msg: # only the start of a multi-byte character arrived so far
+        return True
+
+    # don't print the actual SAY part if say command
+    if msg.startswith("SAY "):
+        print (msg[4:])
+    else:
+        print(msg)
+    print(PROMPT, end='', flush=True)
+    return True
 
+###############################################################################
+# Read what the user typed and send each complete line to the server.
+# stdin is read with os.read() rather than sys.stdin.readline(): readline()
+# can pull several lines into Python's buffer at once, and the selector would
+# then never report the rest as ready.
+###############################################################################
+def sendCommand():
+    """Send every line typed so far. Returns False when we should exit."""
+    data = os.read(sys.stdin.fileno(), BUFFER_SIZE)
+    if not data:
+        # e.g., Ctrl+D; a last line without '\n' still counts
+        if g_stdinPending:
+            sendLine(str(g_stdinPending, 'utf-8', 'replace'))
+        print("Exiting client.")
+        return False
+
+    g_stdinPending.extend(data)
     while True:
-        try:
-            received_data = g_serverSocket.recv(BUFFER_SIZE) #receive data from the server
-
-            # if data is none
-            if not received_data:
-                print("Server disconnected.")
-                checkDisconnect = True
-                break
-            msg = received_data.decode('utf-8') #decode the data
-            # don't print the actual SAY part if say command
-            if msg.startswith("SAY "):
-                print (msg[4:])
-            else:
-                print(msg)  
-        
-        except (socket.error, ConnectionResetError):
-            print("Connection lost.")
-            break 
-
-    g_serverSocket.close()
-    sys.exit(0)
+        end = g_stdinPending.find(b'\n')
+        if end < 0:
+            return True
+        line = str(g_stdinPending[:end], 'utf-8', 'replace')
+        del g_stdinPending[:end + 1]
+        if not sendLine(line):
+            return False
+
+def sendLine(cmd):
+    """Send one command. Returns False when we should exit."""
+    cmd = cmd.rstrip('\r')
+    if not cmd:  # empty line
+        print(PROMPT, end='', flush=True)
+        return True
+
+    # send command to server; the server reads one command per line
+    g_serverSocket.sendall((cmd + '\n').encode('utf-8'))
+
+    # If QUIT => stop
+    if cmd.upper().startswith("QUIT"):
+        return False
+
+    # the server doesn't answer chat messages, so prompt again right away
+    if cmd.upper().startswith("SAY"):
+        print(PROMPT, end='', flush=True)
+    return True
 
 
 ###############################################################################
-# main: connect to server, spawn receiver thread, send commands in a loop
+# main: connect to server, then wait on keyboard + socket in one loop
 ###############################################################################
 def main():
     global g_serverSocket
-    global checkDisconnect
-    checkDisconnect = False
 
     if len(sys.argv) != 3:
         print(f"Usage: {sys.argv[0]} <SERVER_IP> <PORT>")
@@ -88,38 +119,25 @@ def main():
     # Create socket & connect to server
     g_serverSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     g_serverSocket.connect((serverIP, port))
+    g_serverSocket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # send short commands right away
 
     print(f"Connected to server {serverIP}:{port}")
 
-    # Spawn receiver thread
-    t = threading.Thread(target=receiverThread, args=())
-    t.daemon = True
-    t.start()
-
-    # Main loop: read commands, send to server
-    while True:
-        time.sleep(0.1) #  delay to avoid going on to next command before change in checkDisconnect is rendered
-        if checkDisconnect == True:
-            break
-
-        try:
-            cmd = input("Enter command (MOVE/ATTACK/QUIT): ")
-        except EOFError:
-            # e.g., Ctrl+D
-            print("Exiting client.")
-            break
-
-        if not cmd:  # empty line
-            continue
-
-        # send command to server
-        g_serverSocket.sendall(cmd.encode('utf-8'))
-        
-        # If QUIT => break
-        if cmd.upper().startswith("QUIT"):
-            break
+    # Watch both the server and the keyboard; each callback returns False to stop
+    sel = selectors.DefaultSelector()
+    sel.register(g_serverSocket, selectors.EVENT_READ, receiveUpdate)
+    sel.register(sys.stdin, selectors.EVENT_READ, sendCommand)
+
+    # Main loop: handle whichever of the two is ready
+    running = True
+    while running:
+        for key, _ in sel.select():
+            if not key.data():
+                running = False
+                break
 
     # cleanup
+    sel.close()
     if g_serverSocket:
         g_serverSocket.close()
     sys.exit(0)
@@ -9,82 +9,113 @@ Skeleton for a networked ASCII "Battle Game" server in Python.
 4. On receiving commands (MOVE, ATTACK, QUIT, etc.), update the game state
    and broadcast the updated state to all connected clients.
 
+All sockets are served by one selector loop in a single thread, and every
+callback runs to completion before the next event is handled. Only that
+thread touches g_gameState and g_clientSockets, so no lock is needed; keep
+it that way (no threads, no blocking waits inside a callback).
+
 Usage:
    python server.py <PORT>
 """
 
 import sys
 import socket
-import threading
-import time
+import selectors
+import functools
 
 MAX_CLIENTS = 4
-BUFFER_SIZE = 1024
+BUFFER_SIZE = 4096
+LISTEN_BACKLOG = 128  # pending connections the kernel will queue for accept()
 GRID_ROWS = 5
 GRID_COLS = 5
 
+# Grid cells are stored as bytes, so compare against these rather than str
+EMPTY_CELL = ord('.')
+OBSTACLE_CELL = ord('#')
+POTION_CELL = ord('+')
+
+# Player labels 'A', 'B', 'C', 'D', as str for printing and as grid bytes
+PLAYER_CHARS = [chr(ord('A') + i) for i in range(MAX_CLIENTS)]
+PLAYER_BYTES = bytes(ord('A') + i for i in range(MAX_CLIENTS))
+
+# Fixed messages, encoded once at load time
+MSG_READY = b"READY\n"
+MSG_INVALID = b"Invalid command"
+MSG_SERVER_FULL = b"Server is full."
+DEATH_MSGS = [b"You were killed by Player " + c.encode('ascii') for c in PLAYER_CHARS]
+
+# (row, col) step for each direction accepted by MOVE and JUMP
+DIRECTIONS = {
+    'UP': (-1, 0),
+    'DOWN': (1, 0),
+    'LEFT': (0, -1),
+    'RIGHT': (0, 1)
+}
+
 ###############################################################################
 # Data Structures
 ###############################################################################
 
-# Each player can be stored as a dict, for instance:
-# {
-#    'x': int,
-#    'y': int,
-#    'hp': int,
-#    'active': bool
-# }
+# Players are stored as parallel lists (one entry per player slot), so
+# player i is at (playerX[i], playerY[i]) with playerHP[i] health and is
+# playing if playerActive[i] is True.
 
 # The global game state might be stored in a dictionary:
 # {
-#   'grid': [ [char, ...], ... ],        # 2D list of chars
-#   'players': [ playerDict, playerDict, ...],
+#   'grid': bytearray,                   # flat grid, cell (r,c) at r*GRID_COLS+c
+#   'staticGrid': bytearray,             # same layout without players (obstacles + potions left)
+#   'playerX': [int, ...],               # row of each player
+#   'playerY': [int, ...],               # column of each player
+#   'playerHP': [int, ...],
+#   'playerActive': [bool, ...],
 #   'clientCount': int
 # }
 
 g_gameState = {}
 g_clientSockets = [None] * MAX_CLIENTS  # track client connections
-g_stateLock = threading.Lock()          # lock for the game state
+g_recvBufs = [bytearray(BUFFER_SIZE) for _ in range(MAX_CLIENTS)]  # reused recv buffer per slot
+g_pendingInput = [bytearray() for _ in range(MAX_CLIENTS)]  # received bytes not yet ending in '\n'
+g_discardingLine = [False] * MAX_CLIENTS  # dropping the rest of an overlong line
+g_occupancy = {}                        # (x, y) -> set of indices of active players standing there
+g_selector = selectors.DefaultSelector() # epoll on Linux; one loop serves all sockets
+g_stateDirty = True                     # set whenever players/grid change
+g_cachedStateBytes = b''                # last encoded STATE message
+g_cachedStateView = memoryview(b'')     # zero-copy view of g_cachedStateBytes
 
 ###############################################################################
 # Initialize the game state
 ###############################################################################
 def initGameState():
     global g_gameState
-    # Create a 2D grid filled with '.'
-    grid = []
-    for r in range(GRID_ROWS):
-        row = ['.'] * GRID_COLS
-        grid.append(row)
+    # Create a flat grid filled with '.'
+    grid = bytearray(b'.' * (GRID_ROWS * GRID_COLS))
 
     # Example: place a couple of obstacles '#'
     # (Feel free to add more or randomize them.)
-    grid[2][2] = '#'
-    grid[1][3] = '#'
+    grid[2 * GRID_COLS + 2] = OBSTACLE_CELL
+    grid[1 * GRID_COLS + 3] = OBSTACLE_CELL
 
     # Placing HP potions for players
     # If a player goes to the cell with a potion, they get 5 HP
-    grid[3][1] = '+'
-    grid[0][4] = '+'
-    grid[1][3] = '+'
-    grid[2][3] = '+'
+    grid[3 * GRID_COLS + 1] = POTION_CELL
+    grid[0 * GRID_COLS + 4] = POTION_CELL
+    grid[1 * GRID_COLS + 3] = POTION_CELL
+    grid[2 * GRID_COLS + 3] = POTION_CELL
 
-    # Initialize players
-    players = []
-    for i in range(MAX_CLIENTS):
-        p = {
-            'x': -1,
-            'y': -1,
-            'hp': 100,
-            'active': False
-        }
-        players.append(p)
+    # Remember the board without players, so clearing them is a single copy
+    staticGrid = bytearray(grid)
 
+    # Initialize players
     g_gameState = {
         'grid': grid,
-        'players': players,
+        'staticGrid': staticGrid,
+        'playerX': [-1] * MAX_CLIENTS,
+        'playerY': [-1] * MAX_CLIENTS,
+        'playerHP': [100] * MAX_CLIENTS,
+        'playerActive': [False] * MAX_CLIENTS,
         'clientCount': 0
     }
+    g_occupancy.clear()
 
 ###############################################################################
 # Refresh the grid with current player positions.
@@ -94,369 +125,431 @@ def initGameState():
 def refreshPlayerPositions():
     """Clear old positions (leaving obstacles) and place each active player."""
     grid = g_gameState['grid']
-    players = g_gameState['players']
+    playerX = g_gameState['playerX']
+    playerY = g_gameState['playerY']
+    playerHP = g_gameState['playerHP']
 
-    # Clear non-obstacle cells
-    for r in range(GRID_ROWS):
-        for c in range(GRID_COLS):
-            if grid[r][c] != '#' and grid[r][c] != '+':
-                grid[r][c] = '.'
+    # Clear non-obstacle cells by restoring the player-free board
+    grid[:] = g_gameState['staticGrid']
 
     # Place each active player
-    for i, player in enumerate(players):
-        if player['active'] and player['hp'] > 0:
-            px = player['x']
-            py = player['y']
-            grid[px][py] = chr(ord('A') + i)  # 'A', 'B', 'C', 'D'
+    for i, active in enumerate(g_gameState['playerActive']):
+        if active and playerHP[i] > 0:
+            grid[playerX[i] * GRID_COLS + playerY[i]] = PLAYER_BYTES[i]  # 'A', 'B', 'C', 'D'
 
 ###############################################################################
-# Build a string that represents the current game state (ASCII grid), 
-# which you can send to all clients.
+# Build the (already encoded) message that represents the current game state
+# (ASCII grid), which you can send to all clients.
 ###############################################################################
 def buildStateString():
     # e.g., prefix with "STATE\n", then rows of the grid, then player info
     buffer = []
-    buffer.append("STATE\n")
+    buffer.append(b"STATE\n")
 
-    # Copy the grid
+    # Copy the grid, one row slice at a time
     board = g_gameState['grid']
 
-    for row in board:
-        for c in row:
-            buffer.append(c)
-        buffer.append("\n")
+    for r in range(0, len(board), GRID_COLS):
+        buffer.append(board[r:r + GRID_COLS])
+        buffer.append(b"\n")
 
     #print(g_gameState['grid'])
 
     # ...
     # Optionally append player info to the string
-    buffer.append("Players:\n")
-    players = g_gameState['players']
-    for i, player in enumerate(players):
-        if player['active']:
+    buffer.append(b"Players:\n")
+    playerX = g_gameState['playerX']
+    playerY = g_gameState['playerY']
+    playerHP = g_gameState['playerHP']
+    for i, active in enumerate(g_gameState['playerActive']):
+        if active:
             # append info from the player database
-            buffer.append("  Player "+ str(i) + ": HP="+ str(player['hp']) + ' Pos = (' + str(player['x']) + ',' + str(player['y']) + ')\n')
+            buffer.append(b"  Player %d: HP=%d Pos = (%d,%d)\n" % (i, playerHP[i], playerX[i], playerY[i]))
 
-    return ''.join(buffer)
+    return b''.join(buffer)
 
 
+###############################################################################
+# Send a sequence of buffers to one socket.
+# sendmsg() hands every buffer to the kernel as its own iovec in a single
+# syscall, so e.g. a header + body goes out in one call instead of two
+# sendall()s. We only loop if the kernel accepted part of the data.
+###############################################################################
+def sendBuffers(sock, buffers):
+    if not hasattr(sock, 'sendmsg'):  # e.g. Windows has no sendmsg
+        sock.sendall(b''.join(buffers))
+        return
+
+    views = [memoryview(b) for b in buffers]
+    while views:
+        sent = sock.sendmsg(views)
+        # drop the buffers that went out completely, trim a partial one
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if views and sent:
+            views[0] = views[0][sent:]
+
 ###############################################################################
 # Broadcast the current game state to all connected clients
 ###############################################################################
 
 def broadcastState():
-    stateStr = buildStateString().encode('utf-8')  # Encode state message
-    for sock in g_clientSockets:
+    global g_stateDirty, g_cachedStateBytes, g_cachedStateView
+
+    # only rebuild the state message if something changed since last time
+    if g_stateDirty:
+        g_cachedStateBytes = buildStateString()
+        g_cachedStateView = memoryview(g_cachedStateBytes)
+        g_stateDirty = False
+    stateView = g_cachedStateView
+    for i, sock in enumerate(g_clientSockets):
         if sock:
             try:
-                sock.sendall(stateStr)
+                sendBuffers(sock, (stateView,))
             except socket.error:
                 print("Error sending state to a client. Closing connection.")
-                sock.close()
-                g_clientSockets[g_clientSockets.index(sock)] = None
+                dropClient(i)
 
 ###############################################################################
-# Handle a client command: MOVE, ATTACK, QUIT, etc.
-#  - parse the string
-#  - update the player's position or HP
-#  - call refreshPlayerPositions() and broadcastState()
+# Add/remove a player to/from g_occupancy at its current (x, y).
+# A newly joined player can be placed on top of someone already at its start
+# cell, so each cell holds a set of players; empty cells have no entry.
 ###############################################################################
-def handleCommand(playerIndex, cmd):
-    with g_stateLock:
-        players = g_gameState['players']
-
-        # original player position
-        ogx = players[playerIndex]['x']
-        ogy = players[playerIndex]['y']
-
-        # Example: parse "MOVE UP", "MOVE DOWN", etc.
-        if cmd.startswith("MOVE"):
-            if "UP" in cmd:
-
-                # get up position coordinates
-                nx = players[playerIndex]['x'] - 1
-                ny = players[playerIndex]['y']
-
-                # ensure new position is in grid and is not an obstacle or occupied by another player
-                if 0 <= nx < GRID_ROWS and (g_gameState['grid'][nx][ny] == '.' or g_gameState['grid'][nx][ny] == '+'):
-                   
-                   # update grid and player position
-                    g_gameState['grid'][ogx][ogy] = '.'  # remove player from old position
-                    players[playerIndex]['x'] = nx
-                    if g_gameState['grid'][nx][ny] == '+':
-                        players[playerIndex]['hp'] += 5
-                    g_gameState['grid'][nx][ny] = chr(ord('A') + playerIndex)  # update position of player
-
-                # send new state to all players
-                refreshPlayerPositions()
-                broadcastState()
-            elif "DOWN" in cmd:
-
-                # get down position coordinates
-                nx = players[playerIndex]['x'] + 1
-                ny = players[playerIndex]['y']
-
-                # ensure new position is in grid and is not an obstacle or occupied by another player
-                if nx < GRID_ROWS and (g_gameState['grid'][nx][ny] == '.' or g_gameState['grid'][nx][ny] == '+'):
-                    
-                    # update grid and player position
-                    g_gameState['grid'][ogx][ogy] = '.'  # remove player from old position
-                    players[playerIndex]['x'] = nx
-                    if g_gameState['grid'][nx][ny] == '+':
-                        players[playerIndex]['hp'] += 5
-                    g_gameState['grid'][nx][ny] = chr(ord('A') + playerIndex) # update position of player
-
-                # send new state to all players
-                refreshPlayerPositions()
-                broadcastState()
-            elif "LEFT" in cmd:
-                # get left position coordinates
-                nx = players[playerIndex]['x']
-                ny = players[playerIndex]['y'] - 1
-
-                # ensure new position is in grid and is not an obstacle or occupied by another player
-                if 0 <= ny < GRID_COLS and (g_gameState['grid'][nx][ny] == '.' or g_gameState['grid'][nx][ny] == '+'):
-                    
-                    # update grid and player position
-                    g_gameState['grid'][ogx][ogy] = '.'  # remove player from old position
-                    players[playerIndex]['y'] = ny
-                    if g_gameState['grid'][nx][ny] == '+':
-                        players[playerIndex]['hp'] += 5
-                    g_gameState['grid'][nx][ny] = chr(ord('A') + playerIndex) # update position of player
-
-                # send new state to all players
-                refreshPlayerPositions()
-                broadcastState()
-            elif "RIGHT" in cmd:
-                # get right position coordinates
-                nx = players[playerIndex]['x']
-                ny = players[playerIndex]['y'] + 1
-
-                # ensure new position is in grid and is not an obstacle or occupied by another player
-                if ny < GRID_COLS and (g_gameState['grid'][nx][ny] == '.' or g_gameState['grid'][nx][ny] == '+'):
-                    
-                    # update grid and player position
-                    g_gameState['grid'][ogx][ogy] = '.'  # remove player from old position
-                    players[playerIndex]['y'] = ny
-                    if g_gameState['grid'][nx][ny] == '+':
-                        players[playerIndex]['hp'] += 5
-                    g_gameState['grid'][nx][ny] = chr(ord('A') + playerIndex) # update position of player
-
-                # send new state to all players
-                refreshPlayerPositions()
-                broadcastState()
-            else:
-                g_clientSockets[playerIndex].send('Invalid command'.encode('utf-8'))
-
-        elif cmd.startswith("ATTACK"):
-            # original player position
-            ogx = players[playerIndex]['x']
-            ogy = players[playerIndex]['y']
-
-            # check if any player is adjacent to the player who attacked
-            for i, player in enumerate(players):
-                if player['active'] and player['hp'] > 0:
-                    if player['x'] == ogx - 1 and player['y'] == ogy:  # if a player is 1 up
-                        player['hp'] -= 10
-                    elif player['x'] == ogx + 1 and player['y'] == ogy:  # if a player is 1 down
-                        player['hp'] -= 10
-                    elif player['x'] == ogx and player['y'] == ogy - 1:  # if a player is 1 left
-                        player['hp'] -= 10
-                    elif player['x'] == ogx and player['y'] == ogy + 1:  # if a player is 1 right
-                        player['hp'] -= 10
-
-                    # If a player was attacked and died
-                    if player['hp'] <= 0:
-                        # print to server
-                        print (f"Player {chr(ord('A') + i)} has been killed by Player {chr(ord('A') + playerIndex)}") 
-                        
-                        # Send message to client who died
-                        message = f"You were killed by Player {chr(ord('A') + playerIndex)}"
-                        try:
-                            g_clientSockets[i].sendall(message.encode('utf-8'))  
-                        except socket.error:
-                            print(f"Failed to send death message to Player {chr(ord('A') + i)}")
-                        
-                        time.sleep(0.5) # need a delay to send message before the connection is cut to killed player
-                        
-                        # close connection of killed player
-                        players[i]['active'] = False
-                        g_clientSockets[i].close()
-                        g_clientSockets[i] = None
-                        g_gameState['clientCount'] -= 1
-
-            # show new state of game to players
-            refreshPlayerPositions()
-            broadcastState()
-
-        elif cmd.startswith("QUIT"):
-            print(f"Player {playerIndex} quit the game.") # print message to server
-
-            # remove player from game
-            players[playerIndex]['active'] = False
-            players[playerIndex]['x'] = -1  # Remove player from grid
-            players[playerIndex]['y'] = -1
-            g_gameState['grid'][ogx][ogy] = '.'  # Clear player position
-
-            if g_clientSockets[playerIndex]:  
-                message = f"Player {playerIndex} has quit the game."
+def occupyCell(playerIndex):
+    pos = (g_gameState['playerX'][playerIndex], g_gameState['playerY'][playerIndex])
+    g_occupancy.setdefault(pos, set()).add(playerIndex)
+
+def vacateCell(playerIndex):
+    pos = (g_gameState['playerX'][playerIndex], g_gameState['playerY'][playerIndex])
+    occupants = g_occupancy.get(pos)
+    if occupants is not None:
+        occupants.discard(playerIndex)
+        if not occupants:
+            del g_occupancy[pos]
+
+###############################################################################
+# Try to move a player `distance` cells in `direction` (a key of DIRECTIONS).
+# MOVE uses a distance of 1 and JUMP a distance of 2. The move only happens
+# if the target cell is inside the grid and is empty or holds a potion.
+###############################################################################
+def movePlayer(playerIndex, direction, distance):
+    global g_stateDirty
+    playerX = g_gameState['playerX']
+    playerY = g_gameState['playerY']
+    staticGrid = g_gameState['staticGrid']
+
+    dx, dy = DIRECTIONS[direction]
+    nx = playerX[playerIndex] + dx * distance
+    ny = playerY[playerIndex] + dy * distance
+
+    # ensure new position is in grid and is not an obstacle or occupied by another player
+    if not (0 <= nx < GRID_ROWS and 0 <= ny < GRID_COLS):
+        return
+    cell = nx * GRID_COLS + ny
+    if staticGrid[cell] == OBSTACLE_CELL or (nx, ny) in g_occupancy:
+        return
+
+    # If a player goes to the cell with a potion, they get 5 HP
+    if staticGrid[cell] == POTION_CELL:
+        g_gameState['playerHP'][playerIndex] += 5
+        staticGrid[cell] = EMPTY_CELL  # potion is used up
+
+    # update player position (the grid is repainted by refreshPlayerPositions)
+    vacateCell(playerIndex)
+    playerX[playerIndex] = nx
+    playerY[playerIndex] = ny
+    occupyCell(playerIndex)
+    g_stateDirty = True
+
+###############################################################################
+# Command handlers. Each one is called as handler(playerIndex, arg), where
+# arg is whatever followed the command word (e.g. "UP" for "MOVE UP").
+###############################################################################
+def sendInvalid(playerIndex):
+    try:
+        g_clientSockets[playerIndex].send(MSG_INVALID)
+    except socket.error: # the client is gone, so stop serving it
+        print(f"Error with player {playerIndex}.")
+        disconnectPlayer(playerIndex)
+
+# MOVE and JUMP: registered below with distance 1 and 2
+def handleStep(playerIndex, arg, distance):
+    if arg not in DIRECTIONS:
+        sendInvalid(playerIndex)
+        return
+
+    movePlayer(playerIndex, arg, distance)
+
+    # send new state to all players
+    refreshPlayerPositions()
+    broadcastState()
+
+def handleAttack(playerIndex, arg):
+    global g_stateDirty
+    playerHP = g_gameState['playerHP']
+
+    # original player position
+    ogx = g_gameState['playerX'][playerIndex]
+    ogy = g_gameState['playerY'][playerIndex]
+
+    # hit any player 1 up, down, left or right of the player who attacked
+    for dx, dy in DIRECTIONS.values():
+        # sorted() copies the set, since dropClient removes killed players from it
+        for i in sorted(g_occupancy.get((ogx + dx, ogy + dy), ())):
+            playerHP[i] -= 10
+            g_stateDirty = True
+
+            # If a player was attacked and died
+            if playerHP[i] <= 0:
+                # print to server
+                print (f"Player {PLAYER_CHARS[i]} has been killed by Player {PLAYER_CHARS[playerIndex]}")
+
+                # Send message to client who died
                 try:
-                    # for each player still playing
-                    for i in range (len(g_clientSockets)): 
-                        if g_clientSockets[i]:
-                            g_clientSockets[i].sendall(message.encode('utf-8'))  # Send message
+                    g_clientSockets[i].sendall(DEATH_MSGS[playerIndex])
                 except socket.error:
-                    print(f"Failed to send Quit messages")
-                
-                time.sleep(0.5) # need a delay to send message before the connection is cut
-
-                # close connection of quitting player
-                g_clientSockets[playerIndex].close()
-                g_clientSockets[playerIndex] = None
-                g_gameState['clientCount'] -= 1
-
-            # send new state to all players
-            refreshPlayerPositions()
-            broadcastState()
-
-        elif cmd.startswith("JUMP"):  
-            if "UP" in cmd:
-                # get potential new position coordinates (2 cells up)
-                nx = players[playerIndex]['x'] - 2
-                ny = players[playerIndex]['y']
-
-                if 0 <= nx < GRID_ROWS and (g_gameState['grid'][nx][ny] == '.' or g_gameState['grid'][nx][ny] == '+'):
-                    
-                    # update the grid and player's position
-                    g_gameState['grid'][ogx][ogy] = '.'
-                    players[playerIndex]['x'] = nx
-                    if g_gameState['grid'][nx][ny] == '+':
-                        players[playerIndex]['hp'] += 5
-                    g_gameState['grid'][nx][ny] = chr(ord('A') + playerIndex)
-                refreshPlayerPositions()
-                broadcastState()
-            elif "DOWN" in cmd:
-                # get potential new position coordinates (2 cells down)
-                nx = players[playerIndex]['x'] + 2
-                ny = players[playerIndex]['y']
-
-                # if no player occupies the cell and it is not an obstacle
-                if nx < GRID_ROWS and (g_gameState['grid'][nx][ny] == '.' or g_gameState['grid'][nx][ny] == '+'):
-                    
-                    # update the grid and player's position
-                    g_gameState['grid'][ogx][ogy] = '.'
-                    players[playerIndex]['x'] = nx
-                    if g_gameState['grid'][nx][ny] == '+':
-                        players[playerIndex]['hp'] += 5
-                    g_gameState['grid'][nx][ny] = chr(ord('A') + playerIndex)
-                refreshPlayerPositions()
-                broadcastState()
-            elif "LEFT" in cmd:
-                # get potential new position coordinates (2 cells left)
-                nx = players[playerIndex]['x']
-                ny = players[playerIndex]['y'] - 2
-
-                # if no player occupies the cell and it is not an obstacle
-                if 0 <= ny < GRID_COLS and (g_gameState['grid'][nx][ny] == '.' or g_gameState['grid'][nx][ny] == '+'):
-                    
-                    # update the grid and player's position
-                    g_gameState['grid'][ogx][ogy] = '.'
-                    players[playerIndex]['y'] = ny
-                    if g_gameState['grid'][nx][ny] == '+':
-                        players[playerIndex]['hp'] += 5
-                    g_gameState['grid'][nx][ny] = chr(ord('A') + playerIndex)
-                refreshPlayerPositions()
-                broadcastState()
-            elif "RIGHT" in cmd:
-                # get potential new position coordinates (2 cells right)
-                nx = players[playerIndex]['x']
-                ny = players[playerIndex]['y'] + 2
-
-                # if no player occupies the cell and it is not an obstacle
-                if ny < GRID_COLS and (g_gameState['grid'][nx][ny] == '.' or g_gameState['grid'][nx][ny] == '+'):
-                    
-                    # update the grid and player's position
-                    g_gameState['grid'][ogx][ogy] = '.'
-                    players[playerIndex]['y'] = ny
-                    if g_gameState['grid'][nx][ny] == '+':
-                        players[playerIndex]['hp'] += 5
-                    g_gameState['grid'][nx][ny] = chr(ord('A') + playerIndex)
-                refreshPlayerPositions()
-                broadcastState()
-            else:
-                g_clientSockets[playerIndex].send('Invalid command'.encode('utf-8'))
-        elif cmd.startswith("SAY"):
-            msg_cmd = cmd.split(' ')
-            # SAY will get stripped on client end
-            msg = 'SAY Player' + str(playerIndex) + ': '
-
-            # append all words of the message exculding the SAY keyword
-            for i in msg_cmd[1:]:
-                msg += i
-            msgStr = msg.encode('utf-8')  # Encode state message
-
-            # send message to all other players
-            for i, sock in enumerate(g_clientSockets):
-                # don't send to user that the message came from
-                if sock and i != playerIndex:
-                    try:
-                        sock.sendall(msgStr)
-                    except socket.error:
-                        print("Error sending message to a client. Closing connection.")
-                        sock.close()
-                        g_clientSockets[g_clientSockets.index(sock)] = None
-            
-            # send new state to all players
-            refreshPlayerPositions()
-            broadcastState()
-        else: # if the command entered was non of the possible commands
-            g_clientSockets[playerIndex].send('Invalid command'.encode('utf-8'))
-
-
-        
-
-
-###############################################################################
-# Thread function: handle communication with one client
-###############################################################################
-
-def clientHandler(playerIndex):
-    sock = g_clientSockets[playerIndex]
-    with g_stateLock:
-        g_gameState['players'][playerIndex]['x'] = playerIndex  # Start position
-        g_gameState['players'][playerIndex]['y'] = 0 # start position
-        g_gameState['players'][playerIndex]['hp'] = 100 #initial health
-        g_gameState['players'][playerIndex]['active'] = True #player is active
-
-        refreshPlayerPositions() #update the grid with the player's position
-        
-        sock.send(b"READY\n")  # Notify client
-        broadcastState() #send the current state to all clients
-
-    while True:
+                    print(f"Failed to send death message to Player {PLAYER_CHARS[i]}")
+
+                # close connection of killed player
+                dropClient(i)
+
+    # show new state of game to players
+    refreshPlayerPositions()
+    broadcastState()
+
+def handleQuit(playerIndex, arg):
+    global g_stateDirty
+    print(f"Player {playerIndex} quit the game.") # print message to server
+
+    # remove player from game (refreshPlayerPositions clears its cell)
+    g_gameState['playerActive'][playerIndex] = False
+    g_stateDirty = True
+    vacateCell(playerIndex)
+    g_gameState['playerX'][playerIndex] = -1  # Remove player from grid
+    g_gameState['playerY'][playerIndex] = -1
+
+    if g_clientSockets[playerIndex]:
+        message = b"Player %d has quit the game." % playerIndex
         try:
-            player_command = sock.recv(BUFFER_SIZE).decode('utf-8').strip() #receive the command from the client
-            if not player_command: #if the client has disconnected
-                print(f"Player {playerIndex} disconnected.")
+            # for each player still playing
+            for i in range (len(g_clientSockets)):
+                if g_clientSockets[i]:
+                    g_clientSockets[i].sendall(message)  # Send message
+        except socket.error:
+            print(f"Failed to send Quit messages")
+
+        # close connection of quitting player
+        dropClient(playerIndex)
+
+    # send new state to all players
+    refreshPlayerPositions()
+    broadcastState()
+
+def handleSay(playerIndex, arg):
+    # SAY will get stripped on client end; everything after the SAY
+    # keyword is the message
+    msg = 'SAY Player' + str(playerIndex) + ': ' + arg
+    msgStr = msg.encode('utf-8')  # Encode state message
+
+    # send message to all other players
+    for i, sock in enumerate(g_clientSockets):
+        # don't send to user that the message came from
+        if sock and i != playerIndex:
+            try:
+                sendBuffers(sock, (msgStr,))
+            except socket.error:
+                print("Error sending message to a client. Closing connection.")
+                dropClient(i)
+
+# command word -> handler, built once at import
+COMMAND_HANDLERS = {
+    'MOVE': functools.partial(handleStep, distance=1),
+    'JUMP': functools.partial(handleStep, distance=2),
+    'ATTACK': handleAttack,
+    'QUIT': handleQuit,
+    'SAY': handleSay
+}
+
+###############################################################################
+# Handle a client command: MOVE, ATTACK, QUIT, etc.
+#  - split off the command word and look up its handler
+#  - the handler updates the player's position or HP
+#    and calls refreshPlayerPositions() and broadcastState()
+###############################################################################
+def handleCommand(playerIndex, cmd):
+    # split e.g. "MOVE UP" into the command word and its argument
+    verb, _, arg = cmd.partition(' ')
+
+    handler = COMMAND_HANDLERS.get(verb)
+    if handler is None: # if the command entered was non of the possible commands
+        sendInvalid(playerIndex)
+        return
+    handler(playerIndex, arg)
+
+###############################################################################
+# Close a client's connection and free its slot.
+# The socket is unregistered from the selector before closing it, otherwise
+# a new client that gets the same file descriptor could not be registered.
+# shutdown(SHUT_WR) sends the FIN after anything we already sent (e.g. the
+# death or quit message), so there's no need to sleep before closing.
+###############################################################################
+def dropClient(playerIndex):
+    global g_stateDirty
+    sock = g_clientSockets[playerIndex]
+    if sock is None:
+        return
+
+    g_selector.unregister(sock)
+    try:
+        sock.shutdown(socket.SHUT_WR)
+    except socket.error: # the client may already be gone
+        pass
+    sock.close()
+    g_clientSockets[playerIndex] = None #remove the player from the client list
+    g_pendingInput[playerIndex].clear()
+    g_discardingLine[playerIndex] = False
+    vacateCell(playerIndex)
+    g_gameState['playerActive'][playerIndex] = False #player is no longer active
+    g_gameState['clientCount'] -= 1
+    g_stateDirty = True
+
+###############################################################################
+# Selector callback: a new player's socket was accepted into slot playerIndex
+###############################################################################
+def joinPlayer(playerIndex):
+    global g_stateDirty
+    sock = g_clientSockets[playerIndex]
+    g_gameState['playerX'][playerIndex] = playerIndex  # Start position
+    g_gameState['playerY'][playerIndex] = 0 # start position
+    g_gameState['playerHP'][playerIndex] = 100 #initial health
+    g_gameState['playerActive'][playerIndex] = True #player is active
+    occupyCell(playerIndex)
+    g_stateDirty = True
+
+    refreshPlayerPositions() #update the grid with the player's position
+
+    try:
+        sock.send(MSG_READY)  # Notify client
+    except socket.error: # the client went away right after connecting
+        print(f"Error with player {playerIndex}.")
+        dropClient(playerIndex)
+        refreshPlayerPositions()
+    broadcastState() #send the current state to all clients
+
+###############################################################################
+# Remove a player whose connection ended and show everyone the new state
+###############################################################################
+def disconnectPlayer(playerIndex):
+    dropClient(playerIndex)
+    refreshPlayerPositions() #update the grid with the player's position
+    broadcastState() #send the current state to all clients
+
+###############################################################################
+# Selector callback: a player's socket is readable
+###############################################################################
+def readClient(playerIndex, sock):
+    # the slot may have been closed (or reused) by an earlier event in this
+    # same select() batch, e.g. the player was killed
+    if g_clientSockets[playerIndex] is not sock:
+        return
+
+    buf = g_recvBufs[playerIndex]
+    try:
+        n = sock.recv_into(buf) #receive data from the client
+    except (socket.error, ConnectionResetError): #catch errors
+        print(f"Error with player {playerIndex}.")
+        n = -1
+
+    if n <= 0:
+        # Cleanup on disconnect
+        if n == 0:
+            print(f"Player {playerIndex} disconnected.")
+        disconnectPlayer(playerIndex)
+        return
+
+    # Commands end with '\n'. One recv can hold several commands, or only
+    # part of one, so handle every complete line and keep the rest for later.
+    pending = g_pendingInput[playerIndex]
+    pending += memoryview(buf)[:n]
+
+    # skip what is left of a line that was already rejected as too long
+    if g_discardingLine[playerIndex]:
+        end = pending.find(b'\n')
+        if end < 0:
+            pending.clear()
+            return
+        del pending[:end + 1]
+        g_discardingLine[playerIndex] = False
+
+    try:
+        while True:
+            end = pending.find(b'\n')
+            if end < 0:
                 break
+            player_command = str(pending[:end], 'utf-8', 'replace').strip()
+            del pending[:end + 1]
+
+            if player_command: #handle the command
+                handleCommand(playerIndex, player_command)
+
+            # stop if that command closed this connection (e.g. QUIT)
+            if g_clientSockets[playerIndex] is not sock:
+                return
+    except socket.error: # one broken client must not take down the server
+        print(f"Error with player {playerIndex}.")
+        disconnectPlayer(playerIndex)
+        return
+
+    # don't let a client that never sends '\n' grow the buffer forever;
+    # reject the line and ignore everything up to its '\n'
+    if len(pending) > BUFFER_SIZE:
+        pending.clear()
+        g_discardingLine[playerIndex] = True
+        sendInvalid(playerIndex)
 
-            handleCommand(playerIndex, player_command) #handle the command
+###############################################################################
+# Selector callback: the listening socket has a connection waiting
+###############################################################################
+def acceptClient(serverSock):
+    try:
+        clientSock, addr = serverSock.accept()
+    except OSError: # e.g. the client already gave up (ECONNABORTED) or we're out of fds
+        return
+    print(f"Accepted new client from {addr}")
+
+    # Check if g_gameState['clientCount'] < MAX_CLIENTS
+    # otherwise, reject
+    if g_gameState['clientCount'] >= MAX_CLIENTS:
+        try:
+            clientSock.send(MSG_SERVER_FULL)
+        except socket.error: # the rejected client may already be gone
+            pass
+        finally:
+            clientSock.close()
+        return
+
+    try:
+        clientSock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # don't let Nagle delay small messages
+    except socket.error:
+        clientSock.close()
+        return
 
-        except (socket.error, ConnectionResetError): #catch errors
-            print(f"Error with player {playerIndex}.")
-            break  
+    # find a free slot in g_clientSockets
+    slot = None
+    for i in range(MAX_CLIENTS):
+        if g_clientSockets[i] is None:
+            slot = i
+            break
 
-    # Cleanup on disconnect
-    with g_stateLock:
-        g_gameState['players'][playerIndex]['active'] = False #player is no longer active
-        g_gameState['grid'][g_gameState['players'][playerIndex]['x']][g_gameState['players'][playerIndex]['y']] = '.' #remove the player from the grid
-        g_clientSockets[playerIndex] = None #remove the player from the client list
-        refreshPlayerPositions() #update the grid with the player's position
-        broadcastState() #send the current state to all clients
+    g_clientSockets[slot] = clientSock
+    g_gameState['clientCount'] += 1
+    g_selector.register(clientSock, selectors.EVENT_READ, functools.partial(readClient, slot))
 
+    joinPlayer(slot)
 
 ###############################################################################
-# main: set up server socket, accept clients, spawn threads
+# main: set up server socket, then run the selector loop
 ###############################################################################
 def main():
     if len(sys.argv) != 2:
@@ -467,50 +560,24 @@ def main():
     initGameState()
 
     # Create a TCP socket and bind to <PORT>.
-
-    # TODO: create server socket, bind, listen
-    # Example:
     serverSock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     serverSock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     serverSock.bind(("127.0.0.1", port))
-    serverSock.listen(5)
-    
+    serverSock.listen(LISTEN_BACKLOG)
+    g_selector.register(serverSock, selectors.EVENT_READ, acceptClient)
+
     print(f"Server listening on port {port}, IP ... 127.0.0.1")
 
     try:
-
+        # every socket event is dispatched to its callback from this one thread
         while True:
-            # TODO: accept new connection
-            clientSock, addr = serverSock.accept()
-            print(f"Accepted new client from {addr}")
-
-            # 1) Lock state
-            with g_stateLock:
-            # 2) Check if g_gameState['clientCount'] < MAX_CLIENTS
-            #    otherwise, reject
-                if g_gameState['clientCount'] >= MAX_CLIENTS:
-                    clientSock.send("Server is full.".encode('utf-8'))
-                    clientSock.close()
-                    continue
-            #
-            # 3) find a free slot in g_clientSockets
-                slot = None
-                for i in range(MAX_CLIENTS):
-                    if g_clientSockets[i] is None:
-                        slot = i
-                        break
-
-                g_clientSockets[slot] = clientSock
-                g_gameState['clientCount'] += 1
-            # 4) spawn a thread => threading.Thread(target=clientHandler, args=(slot,))
-
-            clientThread = threading.Thread(target=clientHandler, args=(slot,))
-            clientThread.daemon = True
-            clientThread.start()
+            for key, _ in g_selector.select():
+                key.data(key.fileobj)
     except KeyboardInterrupt:
         print("Exiting server.")
     finally:
-        serverSock.close() # somehow need to figure out how to end while loop
+        g_selector.close()
+        serverSock.close()
 
 if __name__ == "__main__":
     main()